@@ -9,3 +9,11 @@ __license__ = "BSD"
 
 from campfire import *
 from room import *
+from delivery import *
+from dispatcher import *
+from presence import *
+from manager import *
+from supervisor import *
+from sync import *
+from columnar import *
+from probe import *
@@ -2,6 +2,10 @@
 Handles Campfire online chat.
 """
 import datetime
+import httplib
+import mimetools
+import mimetypes
+import os
 import re
 import time
 import urllib
@@ -21,8 +25,9 @@ from room import Room
 class Campfire(object):
     """Creates a connection to the Campfire account with the given subdomain.
     Also accepts a boolean indicating whether the connection should be made with
-    SSL or not (default: False)."""
-    def __init__(self, subdomain, ssl=False):
+    SSL or not (default: False) and an httplib2.Http instance to share with
+    other connections (default: a new one)."""
+    def __init__(self, subdomain, ssl=False, http_client=None):
         #: The Campfire's subdomain.
         self.subdomain = subdomain
         #: True if the user is logged in Campfire, False otherwise.
@@ -38,8 +43,10 @@ class Campfire(object):
         self.uri = urlparse.urlparse("%s://%s.campfirenow.com" % (schema, self.subdomain))
         self._location = None
         self._room_re = re.compile(r'room\/(\d*)')
-        self._http_client = httplib2.Http(timeout=5)
-        self._http_client.force_exception_to_status_code = False
+        if http_client is None:
+            http_client = httplib2.Http(timeout=5)
+            http_client.force_exception_to_status_code = False
+        self._http_client = http_client
 
     def login(self, email, password):
         """Logs into Campfire with the given email and password.
@@ -104,22 +111,31 @@ class Campfire(object):
         """Lists the users chatting in any room or in the given room(s).
 
         Returns a set of the users."""
+        all_users = set()
+        for room_name, room_users in self.users_by_room().items():
+            if not room_names or room_name in room_names:
+                all_users.update(room_users)
+        return all_users
+
+    def users_by_room(self):
+        """Lists the users chatting in each room.
+
+        Returns a dictionary of the sets of the users by room name."""
         rooms = self._get_rooms_markup()
 
-        all_users = []
+        result = {}
         for room in rooms:
             try:
                 room_name = room.h2.a.string
             except AttributeError: # the chat is full
                 room_name = room.h2.string.strip()
-            if not room_names or room_name in room_names:
-                room_users_list = room.find('ul')
-                if not room_users_list:
-                    break
-                room_users = room_users_list.findAll('span')
-                for user in room_users:
-                    all_users.append(user.string)
-        return set(all_users)
+            result[room_name] = set()
+            room_users_list = room.find('ul')
+            if not room_users_list:
+                continue
+            for user in room_users_list.findAll('span'):
+                result[room_name].add(user.string)
+        return result
 
     def rooms_names(self):
         """Lists the names of the rooms available in the Campfire subdomain.
@@ -172,12 +188,12 @@ class Campfire(object):
             result[found_room_id].append(self._parse_transcript_date(date))
 
         if room_id:
-            return result[str(room_id)]
+            return result.get(str(room_id), [])
         return result
 
     def _parse_transcript_date(self, date):
-        return datetime.date.fromtimestamp(time.mktime(
-            time.strptime(date, '%Y/%m/%d')))
+        year, month, day = date.split('/')
+        return datetime.date(int(year), int(month), int(day))
 
     def _filter_rooms_markup(self, tag):
         return tag.name == 'div' and tag.has_key('id') and tag['id'].startswith('room_')
@@ -231,6 +247,113 @@ class Campfire(object):
 
         return response
 
+    def _upload(self, path, fileobj, filename, data={}, progress=None,
+            chunk_size=65536, timeout=None):
+        # streams a multipart/form-data body straight from the file, from its
+        # current position, to keep memory use constant whatever the size of
+        # the file; files that can't seek (e.g. pipes) are sent chunked
+        if timeout is None:
+            timeout = self._http_client.timeout
+        boundary = mimetools.choose_boundary()
+        content_type = mimetypes.guess_type(filename)[0] or \
+            'application/octet-stream'
+
+        preamble = []
+        for name, value in data.items():
+            preamble.append('--%s\r\nContent-Disposition: form-data; '
+                'name="%s"\r\n\r\n%s\r\n' % (boundary, name, value))
+        preamble.append('--%s\r\nContent-Disposition: form-data; '
+            'name="upload"; filename="%s"\r\nContent-Type: %s\r\n\r\n' % (
+            boundary, self._quote_filename(filename), content_type))
+        preamble = ''.join(preamble)
+        epilogue = '\r\n--%s--\r\n' % boundary
+
+        try:
+            position = fileobj.tell()
+            fileobj.seek(0, 2)
+            size = fileobj.tell() - position
+            fileobj.seek(position)
+        except (AttributeError, IOError):
+            size = total = None
+        else:
+            total = len(preamble) + size + len(epilogue)
+
+        headers = self._prepare_request()
+        headers['Content-type'] = 'multipart/form-data; boundary=%s' % boundary
+        if total is None:
+            headers['Transfer-Encoding'] = 'chunked'
+        else:
+            headers['Content-length'] = str(total)
+
+        if self.uri[0] == 'https':
+            connection = httplib.HTTPSConnection(self.uri[1])
+        else:
+            connection = httplib.HTTPConnection(self.uri[1])
+        try:
+            # the timeout argument of the connections needs python 2.6
+            connection.connect()
+            connection.sock.settimeout(timeout)
+            location = urlparse.urlparse(self._uri_for(path))
+            if location[4]:
+                connection.putrequest('POST', '%s?%s' % (location[2], location[4]))
+            else:
+                connection.putrequest('POST', location[2])
+            for name, value in headers.items():
+                connection.putheader(name, value)
+            connection.endheaders()
+
+            start = time.time()
+            sent = 0
+            for chunk in self._multipart_chunks(preamble, fileobj, size,
+                    epilogue, chunk_size):
+                if total is None:
+                    connection.send('%x\r\n%s\r\n' % (len(chunk), chunk))
+                else:
+                    connection.send(chunk)
+                sent += len(chunk)
+                if progress:
+                    elapsed = time.time() - start
+                    rate = 0.0
+                    if elapsed:
+                        rate = sent / elapsed
+                    progress(sent, total, rate)
+            if total is None:
+                connection.send('0\r\n\r\n')
+
+            response = connection.getresponse()
+            response.body = response.read()
+        finally:
+            connection.close()
+
+        if response.getheader('set-cookie'):
+            self.cookie = response.getheader('set-cookie')
+
+        return response
+
+    def _quote_filename(self, filename):
+        filename = os.path.basename(filename)
+        if isinstance(filename, unicode):
+            filename = filename.encode('utf-8')
+        filename = filename.replace('\r', '').replace('\n', '')
+        return filename.replace('\\', '\\\\').replace('"', '\\"')
+
+    def _multipart_chunks(self, preamble, fileobj, size, epilogue, chunk_size):
+        # reads the whole file if its size is None
+        yield preamble
+        remaining = size
+        while remaining is None or remaining > 0:
+            if remaining is None:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+            else:
+                chunk = fileobj.read(min(chunk_size, remaining))
+                if not chunk:
+                    raise IOError, 'File shrank while uploading'
+                remaining -= len(chunk)
+            yield chunk
+        yield epilogue
+
     def _post(self, path, data={}, **options):
         return self._perform_request('POST', path, data, **options)
 
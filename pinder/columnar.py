@@ -0,0 +1,218 @@
+"""
+Stores messages column by column for analytics, using NumPy.
+"""
+import datetime
+import os
+import time
+
+try:
+    import numpy
+except ImportError: # numpy is only needed by MessageTable
+    numpy = None
+
+_INT_COLUMNS = ('id', 'user_id', 'room_id', 'timestamp')
+
+def _timestamp(value):
+    if value is None:
+        return -1
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return int(time.mktime(value.timetuple()))
+    return int(value)
+
+def _pack(strings):
+    # packs the strings into one utf-8 buffer and the offsets to slice it
+    offsets = [0]
+    chunks = []
+    position = 0
+    for string in strings:
+        if string:
+            if isinstance(string, unicode):
+                string = string.encode('utf-8')
+            chunks.append(string)
+            position += len(string)
+        offsets.append(position)
+    return (numpy.frombuffer(''.join(chunks) or '\0', dtype=numpy.uint8),
+        numpy.array(offsets, dtype=numpy.int64))
+
+def _unpack(buffer, offsets, index):
+    start, end = offsets[index], offsets[index + 1]
+    if start == end:
+        return None
+    return buffer[start:end].tostring().decode('utf-8')
+
+class MessageTable(object):
+    """Holds message data, as returned by Room.transcript() or
+    Room.messages(), column by column.
+
+    The id, user_id, room_id and timestamp columns are NumPy int64 arrays,
+    with -1 standing for a missing value. The person column holds int32
+    codes into the list of the names of the people, and the message bodies
+    are packed into a single utf-8 buffer. Empty bodies are read back as
+    None.
+
+    Requires U{NumPy<http://numpy.scipy.org/>}."""
+    def __init__(self):
+        if numpy is None:
+            raise ImportError, 'MessageTable requires numpy'
+        self._columns = {}
+        for name in _INT_COLUMNS:
+            self._columns[name] = numpy.zeros(0, dtype=numpy.int64)
+        self._columns['person'] = numpy.zeros(0, dtype=numpy.int32)
+        self._bodies, self._body_offsets = _pack([])
+        self._persons = []
+        self._person_codes = {}
+        self._pending = None
+
+    def __len__(self):
+        self._flush()
+        return len(self._columns['id'])
+
+    def __repr__(self):
+        return "<MessageTable: %d messages>" % len(self)
+
+    def append(self, messages, room_id=None, timestamp=None):
+        """Appends the given message data, all posted in the room with the
+        given id at the given time (seconds since the epoch, a date or a
+        datetime) unless the messages carry their own 'room_id' or
+        'timestamp'."""
+        if self._pending is None:
+            # plain lists of python ints convert exactly to any NumPy int
+            self._pending = dict([(name, [])
+                for name in _INT_COLUMNS + ('person', 'message')])
+        pending = self._pending
+        for message in messages:
+            pending['id'].append(int(message['id']))
+            user_id = message.get('user_id')
+            if user_id is None:
+                user_id = -1
+            pending['user_id'].append(int(user_id))
+            message_room_id = message.get('room_id', room_id)
+            if message_room_id is None:
+                message_room_id = -1
+            pending['room_id'].append(int(message_room_id))
+            pending['timestamp'].append(
+                _timestamp(message.get('timestamp', timestamp)))
+            pending['person'].append(self._person_code(message.get('person')))
+            pending['message'].append(message.get('message'))
+
+    def column(self, name):
+        """Gets the column with the given name: one of id, user_id, room_id,
+        timestamp or person.
+
+        Returns a NumPy array."""
+        self._flush()
+        return self._columns[name]
+
+    def person(self, code):
+        """Gets the name of the person with the given code, None for -1."""
+        if code < 0:
+            return None
+        return self._persons[code]
+
+    def message(self, index):
+        """Gets the message data at the given index, counting from the end if
+        negative.
+
+        Returns a dictionary like Room.transcript() plus room_id and
+        timestamp."""
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError, 'Message index out of range'
+        result = {}
+        for name in _INT_COLUMNS:
+            value = int(self._columns[name][index])
+            if value == -1:
+                value = None
+            result[name] = value
+        result['person'] = self.person(int(self._columns['person'][index]))
+        result['message'] = _unpack(self._bodies, self._body_offsets, index)
+        return result
+
+    def time_buckets(self, width):
+        """Rounds the timestamps down to a multiple of 'width' seconds.
+
+        Returns a NumPy array."""
+        timestamps = self.column('timestamp')
+        return timestamps - timestamps % width
+
+    def count_by(self, *columns, **options):
+        """Counts the messages by the distinct values of the given columns,
+        plus the timestamps bucketed by 'bucket' seconds if given, e.g.
+        count_by('user_id', bucket=3600) counts the messages per user per
+        hour.
+
+        Returns a tuple of the keys, one row per group (a 1-dimensional array
+        when grouping by a single key), and of the counts."""
+        keys = [self.column(name).astype(numpy.int64) for name in columns]
+        if options.get('bucket'):
+            keys.append(self.time_buckets(options['bucket']))
+        if not keys:
+            raise ValueError, 'Nothing to count by'
+        if len(keys) == 1:
+            return numpy.unique(keys[0], return_counts=True)
+        return numpy.unique(numpy.column_stack(keys), axis=0,
+            return_counts=True)
+
+    def save(self, path):
+        """Saves the table to the directory with the given path, creating it
+        if needed."""
+        self._flush()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        persons, person_offsets = _pack(self._persons)
+        arrays = dict(self._columns)
+        arrays.update(bodies=self._bodies, body_offsets=self._body_offsets,
+            persons=persons, person_offsets=person_offsets)
+        for name, values in arrays.items():
+            numpy.save(os.path.join(path, '%s.npy' % name), values)
+
+    def _person_code(self, person):
+        if person is None:
+            return -1
+        try:
+            return self._person_codes[person]
+        except KeyError:
+            code = self._person_codes[person] = len(self._persons)
+            self._persons.append(person)
+            return code
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        pending, self._pending = self._pending, None
+        for name in _INT_COLUMNS + ('person',):
+            self._columns[name] = numpy.concatenate((self._columns[name],
+                numpy.array(pending[name], dtype=self._columns[name].dtype)))
+
+        bodies, offsets = _pack(pending['message'])
+        end = self._body_offsets[-1]
+        self._bodies = numpy.concatenate((self._bodies[:end], bodies))
+        self._body_offsets = numpy.concatenate(
+            (self._body_offsets, offsets[1:] + end))
+
+def load_table(path, mmap=True):
+    """Loads the MessageTable saved in the directory with the given path,
+    memory-mapping its columns unless 'mmap' is False.
+
+    Returns a MessageTable."""
+    mmap_mode = None
+    if mmap:
+        mmap_mode = 'r'
+    def _load(name):
+        return numpy.load(os.path.join(path, '%s.npy' % name),
+            mmap_mode=mmap_mode)
+
+    table = MessageTable()
+    for name in _INT_COLUMNS + ('person',):
+        table._columns[name] = _load(name)
+    table._bodies = _load('bodies')
+    table._body_offsets = _load('body_offsets')
+    persons, person_offsets = _load('persons'), _load('person_offsets')
+    for index in range(len(person_offsets) - 1):
+        table._person_code(_unpack(persons, person_offsets, index))
+    return table
+
+
+__all__ = ['MessageTable', 'load_table']
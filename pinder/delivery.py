@@ -0,0 +1,122 @@
+"""
+Delivers the messages of a Campfire room at most once and in order.
+"""
+import datetime
+
+class MessageBuffer(object):
+    """Wraps a Room and filters the messages it returns so that each message
+    is delivered at most once and in id order, even across a forced join, a
+    network retry or a restart.
+
+    Only the messages newer than the last one delivered get through, so the
+    buffer remembers a single id and a date whatever its life span. Messages
+    arriving after a newer one has been delivered are dropped, and counted
+    in 'late'.
+
+    When the room poll state is reset (the room has been joined again, left,
+    or the buffer was created with the 'last_id' of a previous run) the
+    messages missed in between are backfilled from the room transcripts,
+    starting from the day before 'last_date' if known (the transcripts are
+    dated by the server, whose day may start later than the local one), or
+    else from the most recent transcript holding 'last_id'."""
+    def __init__(self, room, last_id=None, last_date=None):
+        #: The wrapped room.
+        self.room = room
+        #: The id of the last message delivered, None if nothing has been
+        #: delivered yet. Save it to resume delivery after a restart.
+        self.last_id = None
+        if last_id is not None:
+            self.last_id = int(last_id)
+        #: The day the last message was delivered, None if unknown. Save it
+        #: along with 'last_id'.
+        self.last_date = last_date
+        #: The number of messages dropped because a newer message had
+        #: already been delivered, outside of backfills.
+        self.late = 0
+
+        self._cache_id = None
+
+    def __repr__(self):
+        return "<MessageBuffer: %s>" % self.room.name
+
+    def seen(self, id):
+        """Checks if the message with the given id has already been delivered
+        or is older than a message already delivered.
+
+        Returns True if the message must not be delivered, False otherwise."""
+        return self.last_id is not None and int(id) <= self.last_id
+
+    def feed(self, messages):
+        """Filters the given message data, as returned by Room.messages() or
+        Room.transcript().
+
+        Returns the list of the messages not delivered yet, sorted by id."""
+        return self._feed(messages, True)
+
+    def _feed(self, messages, count_late):
+        fresh = {}
+        for message in messages:
+            id = int(message['id'])
+            if not self.seen(id):
+                fresh[id] = message
+            elif count_late and id < self.last_id:
+                self.late += 1
+
+        ids = fresh.keys()
+        ids.sort()
+        if ids:
+            self.last_id = ids[-1]
+            self.last_date = datetime.date.today()
+        return [fresh[id] for id in ids]
+
+    def gap(self):
+        """Checks if some messages may have been missed since the last poll.
+
+        Returns True if the room poll state has been reset, False otherwise."""
+        if self.last_id is None:
+            return False
+        return self._cache_id is None or \
+            self.room.last_cache_id != self._cache_id
+
+    def messages(self):
+        """Gets new messages from the room, backfilling the missed ones if
+        needed.
+
+        Returns a list of message data like Room.messages(), without
+        duplicates and sorted by id."""
+        gap = self.gap()
+        polled = self.room.messages()
+        self._cache_id = self.room.last_cache_id
+
+        backfill = []
+        if gap:
+            backfill = self._backfill()
+        # a backfill holds the messages already delivered too
+        return self._feed(backfill + polled, not gap)
+
+    def _backfill(self):
+        today = datetime.date.today()
+        messages = []
+        if self.last_date is not None:
+            date = self.last_date - datetime.timedelta(days=1)
+            while date <= today:
+                messages.extend(self.room.transcript(date))
+                date += datetime.timedelta(days=1)
+            return messages
+
+        # walk the transcripts back to the one holding the last message
+        dates = list(self.room.transcripts())
+        if today not in dates:
+            dates.append(today)
+        dates.sort()
+        dates.reverse()
+        for date in dates:
+            transcript = self.room.transcript(date)
+            messages.extend(transcript)
+            for message in transcript:
+                if int(message['id']) <= self.last_id:
+                    return messages
+        return messages
+
+
+__all__ = ['MessageBuffer']
@@ -0,0 +1,282 @@
+"""
+Routes the messages of Campfire rooms to handlers.
+"""
+import Queue
+import re
+import sys
+import threading
+import time
+import traceback
+
+# python 2 regular expressions can't have more than 99 groups
+_GROUPS_PER_MATCHER = 99
+
+def _strip_groups(pattern, verbose=False):
+    # turns the capturing groups of the pattern into non-capturing ones so
+    # that it can be combined with others; returns None for the patterns
+    # whose meaning depends on their groups (backreferences, conditionals).
+    # Comments of verbose patterns are copied as they are.
+    result = []
+    index = 0
+    in_class = False
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            escaped = pattern[index + 1:index + 2]
+            if not in_class and escaped.isdigit() and escaped != '0':
+                return None
+            result.append(pattern[index:index + 2])
+            index += 2
+            continue
+        if in_class:
+            if char == ']':
+                in_class = False
+        elif verbose and char == '#':
+            end = pattern.find('\n', index)
+            if end == -1:
+                end = len(pattern)
+            result.append(pattern[index:end])
+            index = end
+            continue
+        elif char == '[':
+            in_class = True
+            result.append(char)
+            index += 1
+            # a leading ] (possibly after ^) is part of the class
+            if pattern[index:index + 1] == '^':
+                result.append('^')
+                index += 1
+            if pattern[index:index + 1] == ']':
+                result.append(']')
+                index += 1
+            continue
+        elif char == '(':
+            if pattern[index + 1:index + 2] != '?':
+                result.append('(?:')
+                index += 1
+                continue
+            if pattern[index + 2:index + 4] == 'P<':
+                end = pattern.find('>', index)
+                if end == -1:
+                    return None
+                result.append('(?:')
+                index = end + 1
+                continue
+            if pattern[index + 2:index + 4] == 'P=' or \
+                    pattern[index + 2:index + 3] == '(':
+                return None
+        result.append(char)
+        index += 1
+    return ''.join(result)
+
+class Dispatcher(object):
+    """Dispatches room messages to the handlers whose pattern matches them.
+
+    The patterns that apply to a room are compiled into a single regular
+    expression (one per set of regular expression flags in use) so that each
+    message is scanned once, whatever the number of handlers. The handler
+    whose pattern matches first in the message wins, ties going to the
+    handler registered first. Patterns with backreferences can't be combined
+    and are searched on their own.
+
+    Handlers run in a pool of 'workers' threads so that a slow handler does
+    not hold up polling; with no workers they run in the polling thread."""
+    def __init__(self, workers=4):
+        #: The number of worker threads running the handlers.
+        self.workers = workers
+        self._handlers = []
+        self._matchers = {}
+        self._stats = []
+        self._lock = threading.Lock()
+        self._queue = Queue.Queue()
+        self._threads = []
+
+    def register(self, pattern, handler, room=None, flags=0):
+        """Registers a handler called for each message matching the given
+        pattern, in the given room only or in any room if 'room' is None.
+
+        The handler is called with the room, the message data and the match
+        object."""
+        regex = re.compile(pattern, flags)
+        room_id = room
+        if room is not None and hasattr(room, 'id'):
+            room_id = room.id
+        self._handlers.append((regex, handler, room_id))
+        self._stats.append(dict(name=self._handler_name(handler),
+            pattern=regex.pattern, room=room_id, calls=0, errors=0,
+            error=None, total=0.0, max=0.0))
+        self._matchers = {}
+
+    def handler(self, pattern, room=None, flags=0):
+        """Decorator flavour of register()."""
+        def _register(function):
+            self.register(pattern, function, room, flags)
+            return function
+        return _register
+
+    def match(self, room, message):
+        """Finds the handler for the given message of the given room.
+
+        Returns a (handler, match) tuple, None if no pattern matches."""
+        index = self._find(room, message)
+        if index is None:
+            return None
+        regex, handler, room_id = self._handlers[index]
+        return handler, regex.search(message['message'])
+
+    def dispatch(self, room, message):
+        """Runs the handler matching the given message, if any.
+
+        Returns the handler, None if no pattern matches."""
+        index = self._find(room, message)
+        if index is None:
+            return None
+        regex, handler, room_id = self._handlers[index]
+        match = regex.search(message['message'])
+        if self._threads:
+            self._queue.put((index, room, message, match))
+        else:
+            self._run(index, room, message, match)
+        return handler
+
+    def poll(self, *rooms):
+        """Gets the new messages of the given rooms and dispatches them.
+
+        Returns the number of messages dispatched to a handler."""
+        dispatched = 0
+        for room in rooms:
+            for message in room.messages():
+                if self.dispatch(room, message) is not None:
+                    dispatched += 1
+        return dispatched
+
+    def start(self):
+        """Starts the worker threads."""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work)
+            thread.setDaemon(True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Waits for the pending handlers to run and stops the worker
+        threads."""
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        """Gets the latency of the handlers.
+
+        Returns a list of dictionaries, one for each registration in
+        registration order, of:
+         * name: the name of the handler
+         * pattern: the pattern of the handler
+         * room: the id of the room of the handler, None for any room
+         * calls: the number of calls
+         * errors: the number of calls that raised an exception
+         * error: the traceback of the last exception raised, None if none
+         * total: the total time spent in the handler, in seconds
+         * max: the longest call, in seconds
+         * mean: the average call, in seconds"""
+        self._lock.acquire()
+        try:
+            result = []
+            for stats in self._stats:
+                stats = stats.copy()
+                stats['mean'] = 0.0
+                if stats['calls']:
+                    stats['mean'] = stats['total'] / stats['calls']
+                result.append(stats)
+            return result
+        finally:
+            self._lock.release()
+
+    def _find(self, room, message):
+        text = message.get('message')
+        if text is None:
+            return None
+        best = None
+        for matcher, index in self._matcher_for(room):
+            found = matcher.search(text)
+            if not found:
+                continue
+            if index is None:
+                index = int(found.lastgroup[2:])
+            if best is None or (found.start(), index) < best:
+                best = (found.start(), index)
+        if best is None:
+            return None
+        return best[1]
+
+    def _matcher_for(self, room):
+        room_id = getattr(room, 'id', room)
+        try:
+            return self._matchers[room_id]
+        except KeyError:
+            pass
+
+        # patterns can only be combined with the ones sharing their flags
+        by_flags = {}
+        flags_order = []
+        matchers = []
+        for index, (regex, handler, handler_room_id) in \
+                enumerate(self._handlers):
+            if handler_room_id is not None and handler_room_id != room_id:
+                continue
+            stripped = _strip_groups(regex.pattern, regex.flags & re.VERBOSE)
+            if stripped is None:
+                matchers.append((regex, index))
+                continue
+            if regex.flags not in by_flags:
+                by_flags[regex.flags] = []
+                flags_order.append(regex.flags)
+            # a comment ending a verbose pattern must not swallow what follows
+            if regex.flags & re.VERBOSE:
+                stripped += '\n'
+            by_flags[regex.flags].append('(?P<_h%d>%s)' % (index, stripped))
+
+        for flags in flags_order:
+            patterns = by_flags[flags]
+            for start in range(0, len(patterns), _GROUPS_PER_MATCHER):
+                chunk = patterns[start:start + _GROUPS_PER_MATCHER]
+                matchers.append((re.compile('|'.join(chunk), flags), None))
+        self._matchers[room_id] = matchers
+        return matchers
+
+    def _handler_name(self, handler):
+        return getattr(handler, '__name__', repr(handler))
+
+    def _run(self, index, room, message, match):
+        handler = self._handlers[index][1]
+        error = None
+        start = time.time()
+        try:
+            handler(room, message, match)
+        except Exception:
+            error = ''.join(traceback.format_exception(*sys.exc_info()))
+        elapsed = time.time() - start
+
+        self._lock.acquire()
+        try:
+            stats = self._stats[index]
+            stats['calls'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+            if error is not None:
+                stats['errors'] += 1
+                stats['error'] = error
+        finally:
+            self._lock.release()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run(*job)
+
+
+__all__ = ['Dispatcher']
@@ -0,0 +1,166 @@
+"""
+Handles many Campfire accounts at once.
+"""
+import time
+
+import httplib2
+
+import campfire
+
+class Manager(object):
+    """Owns the Campfire connections of many accounts, sharing a single
+    HTTP client, heartbeat and poll loop between them.
+
+    Polling is fair between the accounts: each round polls one room of every
+    account, whatever the number of rooms each of them is watching.
+    Accepts the timeout of the HTTP client in seconds (default: 5) and the
+    number of seconds between two pings of the watched rooms (default: 50)."""
+    def __init__(self, timeout=5, heartbeat=50):
+        #: The number of seconds between two pings of the watched rooms.
+        self.heartbeat_interval = heartbeat
+        #: The last time the watched rooms have been pinged, None if never.
+        self.heartbeat_at = None
+        self._http_client = httplib2.Http(timeout=timeout)
+        self._http_client.force_exception_to_status_code = False
+        self._campfires = {}
+        self._subdomains = []
+        self._rooms = {}
+        self._next_room = {}
+        self._first_account = 0
+        self._metrics = {}
+        self._running = False
+
+    def __repr__(self):
+        return "<Manager: %s>" % ", ".join(self._subdomains)
+
+    def add(self, subdomain, ssl=False):
+        """Adds the Campfire account with the given subdomain, unless already
+        added.
+
+        Returns the Campfire instance of the account."""
+        if subdomain not in self._campfires:
+            self._campfires[subdomain] = campfire.Campfire(subdomain, ssl,
+                http_client=self._http_client)
+            self._subdomains.append(subdomain)
+            self._rooms[subdomain] = []
+            self._next_room[subdomain] = 0
+            self._metrics[subdomain] = dict(polls=0, messages=0, errors=0,
+                pings=0, time=0.0)
+        return self._campfires[subdomain]
+
+    def remove(self, subdomain):
+        """Removes the Campfire account with the given subdomain.
+
+        Returns the Campfire instance of the account."""
+        self._subdomains.remove(subdomain)
+        del self._rooms[subdomain]
+        del self._next_room[subdomain]
+        del self._metrics[subdomain]
+        return self._campfires.pop(subdomain)
+
+    def campfires(self):
+        """Lists the Campfire instances of the accounts."""
+        return [self._campfires[subdomain] for subdomain in self._subdomains]
+
+    def watch(self, room):
+        """Adds the given room, of an account already added, to the poll
+        loop."""
+        rooms = self._rooms[room._campfire.subdomain]
+        if room not in rooms:
+            rooms.append(room)
+
+    def unwatch(self, room):
+        """Removes the given room from the poll loop."""
+        self._rooms[room._campfire.subdomain].remove(room)
+
+    def poll(self):
+        """Polls the next room of every account. An account whose room
+        fails to poll is skipped until the next round.
+
+        Returns a list of (room, messages) tuples for the rooms with new
+        messages."""
+        # the account going first changes every round
+        count = len(self._subdomains)
+        start = 0
+        if count:
+            start = self._first_account % count
+            self._first_account = start + 1
+        order = self._subdomains[start:] + self._subdomains[:start]
+
+        result = []
+        for subdomain in order:
+            rooms = self._rooms[subdomain]
+            if not rooms:
+                continue
+            index = self._next_room[subdomain] % len(rooms)
+            self._next_room[subdomain] = index + 1
+            room = rooms[index]
+
+            metrics = self._metrics[subdomain]
+            start = time.time()
+            try:
+                messages = room.messages()
+            except Exception:
+                metrics['errors'] += 1
+                messages = []
+            metrics['time'] += time.time() - start
+            metrics['polls'] += 1
+            metrics['messages'] += len(messages)
+            if messages:
+                result.append((room, messages))
+        return result
+
+    def heartbeat(self, force=False):
+        """Pings all the watched rooms if the heartbeat interval has passed;
+        if 'force' is True ping anyway.
+
+        Returns True if the rooms have been pinged, False otherwise."""
+        now = time.time()
+        if not force and self.heartbeat_at is not None and \
+                now - self.heartbeat_at < self.heartbeat_interval:
+            return False
+        self.heartbeat_at = now
+        for subdomain in self._subdomains:
+            metrics = self._metrics[subdomain]
+            for room in self._rooms[subdomain]:
+                try:
+                    pinged = room.ping(force=True)
+                except Exception:
+                    pinged = False
+                if pinged:
+                    metrics['pings'] += 1
+                else:
+                    metrics['errors'] += 1
+        return True
+
+    def run(self, callback, interval=3):
+        """Polls the watched rooms every 'interval' seconds until stop() is
+        called, calling the given callback with each room and its new
+        messages."""
+        self._running = True
+        while self._running:
+            self.heartbeat()
+            for room, messages in self.poll():
+                callback(room, messages)
+            time.sleep(interval)
+
+    def stop(self):
+        """Stops the poll loop started by run()."""
+        self._running = False
+
+    def metrics(self):
+        """Gets the metrics of the accounts.
+
+        Returns a dictionary by subdomain of:
+         * polls: the number of polls
+         * messages: the number of messages received
+         * errors: the number of failed polls and pings
+         * pings: the number of successful pings
+         * time: the total time spent polling, in seconds"""
+        result = {}
+        for subdomain, metrics in self._metrics.items():
+            result[subdomain] = metrics.copy()
+        return result
+
+
+__all__ = ['Manager']
@@ -0,0 +1,109 @@
+"""
+Tracks who is chatting in the rooms of a Campfire account.
+"""
+import re
+import time
+
+try:
+    set # python 2.3 does not have the set data type
+except NameError:
+    from sets import Set as set
+
+class Presence(object):
+    """Keeps the users chatting in each room of the given Campfire and tells
+    the subscribers who joined or left, instead of handing out the full
+    sets of users.
+
+    The rooms are scraped from the lobby at most once every 'interval'
+    seconds; in between the enter and leave messages read from the rooms
+    keep the users up to date."""
+    def __init__(self, campfire, interval=60):
+        #: The minimum number of seconds between two lobby scrapes.
+        self.interval = interval
+        #: The last time the lobby has been scraped, None if never.
+        self.refreshed_at = None
+        self._campfire = campfire
+        self._users = {}
+        self._subscribers = []
+        self._enter_re = re.compile(r'^has entered the room$')
+        self._leave_re = re.compile(r'^has left the room$')
+
+    def subscribe(self, callback):
+        """Calls the given callback on each change, with the name of the room,
+        the set of the users who joined and the set of the users who left."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Stops calling the given callback."""
+        self._subscribers.remove(callback)
+
+    def users(self, room_name=None):
+        """Lists the users chatting in the given room, or in any room.
+
+        Returns a set of the users."""
+        if room_name is not None:
+            return set(self._users.get(room_name, ()))
+        all_users = set()
+        for room_users in self._users.values():
+            all_users.update(room_users)
+        return all_users
+
+    def refresh(self, force=False):
+        """Scrapes the lobby if the last scrape is older than the interval;
+        if 'force' is True scrape anyway.
+
+        Returns True if the lobby has been scraped, False otherwise."""
+        now = time.time()
+        if not force and self.refreshed_at is not None and \
+                now - self.refreshed_at < self.interval:
+            return False
+        self.refreshed_at = now
+
+        users_by_room = self._campfire.users_by_room()
+        for room_name in self._users.keys():
+            if room_name not in users_by_room:
+                users_by_room[room_name] = set()
+        for room_name, room_users in users_by_room.items():
+            self._update(room_name, room_users)
+        return True
+
+    def feed(self, room, messages):
+        """Updates the users of the given room with the enter and leave
+        messages among the given message data, as returned by
+        Room.messages()."""
+        room_users = set(self._users.get(room.name, ()))
+        for message in messages:
+            person = message.get('person')
+            if not person:
+                continue
+            kind = self._kind(message)
+            if kind == 'enter':
+                room_users.add(person)
+            elif kind in ('leave', 'kick'): # kicked when idle
+                room_users.discard(person)
+        self._update(room.name, room_users)
+
+    def _kind(self, message):
+        if message.get('kind'):
+            return message['kind']
+        # message data without a kind, e.g. from Room.transcript()
+        text = (message.get('message') or '').strip()
+        if self._enter_re.match(text):
+            return 'enter'
+        if self._leave_re.match(text):
+            return 'leave'
+
+    def _update(self, room_name, room_users):
+        previous = self._users.get(room_name, set())
+        joined = room_users - previous
+        left = previous - room_users
+        if room_users:
+            self._users[room_name] = room_users
+        elif room_name in self._users:
+            del self._users[room_name]
+        if joined or left:
+            for callback in self._subscribers:
+                callback(room_name, joined, left)
+
+
+__all__ = ['Presence']
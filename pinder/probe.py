@@ -0,0 +1,208 @@
+"""
+Measures how long messages take to go from a room to another session.
+"""
+import os
+import re
+import time
+
+class Histogram(object):
+    """Counts values, in seconds, in buckets whose upper bounds double from
+    'smallest' seconds (default: 1 millisecond) up to 'buckets' buckets,
+    the last one taking everything bigger."""
+    def __init__(self, smallest=0.001, buckets=18):
+        #: The upper bounds of the buckets, in seconds.
+        self.bounds = [smallest * 2 ** i for i in range(buckets - 1)]
+        self.bounds.append(None)
+        #: The number of values in each bucket.
+        self.counts = [0] * buckets
+        #: The number of values.
+        self.count = 0
+        #: The sum of the values.
+        self.total = 0.0
+        #: The smallest value, None if empty.
+        self.min = None
+        #: The biggest value, None if empty.
+        self.max = None
+
+    def __repr__(self):
+        return "<Histogram: %d values>" % self.count
+
+    def add(self, value):
+        """Counts the given value."""
+        index = 0
+        while self.bounds[index] is not None and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        """Gets the average of the values, None if empty."""
+        if self.count:
+            return self.total / self.count
+
+    def percentile(self, percent):
+        """Gets the upper bound of the bucket holding the given percentile,
+        the biggest value for the last bucket, None if empty."""
+        if not self.count:
+            return None
+        wanted = self.count * percent / 100.0
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= wanted and count:
+                if bound is None:
+                    return self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        """Sums the histogram up.
+
+        Returns a dictionary of count, min, max, mean, p50, p90 and p99."""
+        return dict(count=self.count, min=self.min, max=self.max,
+            mean=self.mean(), p50=self.percentile(50),
+            p90=self.percentile(90), p99=self.percentile(99))
+
+class LatencyProbe(object):
+    """Speaks tagged messages in rooms and looks for them in the messages
+    read by another session in the same rooms, recording for each room:
+     * send: the round trip of Room.speak()
+     * detect: the time from the end of Room.speak() to the poll that
+       found the message
+     * total: the time from the start of Room.speak() to the poll that
+       found the message
+
+    The detection delay can't be shorter than the time between two polls.
+    Messages not found after 'timeout' seconds are counted as lost."""
+    def __init__(self, tag='pinder-probe', timeout=60):
+        #: The text starting the messages sent by the probe.
+        self.tag = tag
+        #: The number of seconds after which a message is counted as lost.
+        self.timeout = timeout
+        self._pairs = []
+        self._pending = {}
+        self._stats = []
+        self._sequence = 0
+        self._run_id = '%x%x' % (os.getpid(), int(time.time()))
+        self._tag_re = re.compile(r'%s (\w+)' % re.escape(tag))
+
+    def add(self, sender, listener):
+        """Probes the room shared by the given Room instances, the first one
+        speaking and the second one, from another Campfire session,
+        listening.
+
+        Returns the index of the room in report()."""
+        self._pairs.append((sender, listener))
+        campfire = getattr(sender, '_campfire', None)
+        self._stats.append(dict(room=sender.name, id=sender.id,
+            subdomain=getattr(campfire, 'subdomain', None),
+            send=Histogram(), detect=Histogram(), total=Histogram(),
+            sent=0, failed=0, lost=0))
+        return len(self._pairs) - 1
+
+    def send(self):
+        """Speaks a tagged message in every probed room.
+
+        Returns the number of messages sent."""
+        sent = 0
+        for index, (sender, listener) in enumerate(self._pairs):
+            self._sequence += 1
+            key = '%s_%d' % (self._run_id, self._sequence)
+            stats = self._stats[index]
+
+            start = time.time()
+            result = sender.speak('%s %s' % (self.tag, key))
+            end = time.time()
+            if result is None:
+                stats['failed'] += 1
+                continue
+            stats['sent'] += 1
+            stats['send'].add(end - start)
+            self._pending[key] = (index, start, end)
+            sent += 1
+        return sent
+
+    def poll(self):
+        """Reads the messages of every probed room and records the latency
+        of the tagged messages found.
+
+        Returns the number of tagged messages found."""
+        found = 0
+        for sender, listener in self._pairs:
+            messages = listener.messages()
+            now = time.time()
+            for message in messages:
+                match = self._tag_re.search(message.get('message') or '')
+                if not match:
+                    continue
+                try:
+                    index, start, end = self._pending.pop(match.group(1))
+                except KeyError: # not ours, or already found
+                    continue
+                stats = self._stats[index]
+                stats['detect'].add(now - end)
+                stats['total'].add(now - start)
+                found += 1
+        self._expire()
+        return found
+
+    def run(self, count, interval=10, poll_interval=1):
+        """Sends 'count' rounds of messages every 'interval' seconds, polling
+        every 'poll_interval' seconds until the last ones are found or lost.
+
+        Returns the report()."""
+        next_send = time.time()
+        while count or self._pending:
+            if count and time.time() >= next_send:
+                self.send()
+                count -= 1
+                next_send += interval
+            time.sleep(poll_interval)
+            self.poll()
+        return self.report()
+
+    def report(self):
+        """Gets the results of the probe.
+
+        Returns a list with a dictionary for each probed room, in the order
+        they were added, of:
+         * room: the name of the room
+         * id: the id of the room
+         * subdomain: the Campfire subdomain of the room, if known
+         * send, detect and total: the summary() of each histogram
+         * sent: the number of messages sent
+         * failed: the number of messages that could not be sent
+         * lost: the number of messages never found"""
+        result = []
+        for stats in self._stats:
+            report = {}
+            for name, value in stats.items():
+                if isinstance(value, Histogram):
+                    value = value.summary()
+                report[name] = value
+            result.append(report)
+        return result
+
+    def histograms(self, index):
+        """Gets the send, detect and total histograms of the room with the
+        given index, as returned by add().
+
+        Returns a dictionary of Histogram instances."""
+        stats = self._stats[index]
+        return dict(send=stats['send'], detect=stats['detect'],
+            total=stats['total'])
+
+    def _expire(self):
+        now = time.time()
+        for key, (index, start, end) in self._pending.items():
+            if now - start > self.timeout:
+                del self._pending[key]
+                self._stats[index]['lost'] += 1
+
+
+__all__ = ['Histogram', 'LatencyProbe']
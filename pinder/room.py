@@ -2,6 +2,7 @@
 Handles the Campfire room.
 """
 from datetime import datetime
+import os
 import re
 import time
 import urlparse
@@ -15,6 +16,7 @@ class Room(object):
         self._verify_response = campfire._verify_response
         self._post = campfire._post
         self._get = campfire._get
+        self._upload = campfire._upload
         self._room = None
 
         self.membership_key = self.user_id = None
@@ -177,6 +179,35 @@ class Room(object):
         self.join()
         return self._send(message, {'paste': True})
 
+    def upload(self, path_or_fileobj, progress=None):
+        """Uploads a file to the room, given its path or a file object.
+
+        The file is streamed from disk so the memory used doesn't depend on
+        its size, starting from the current position of a file object. Files
+        that can't seek, like pipes, are sent with a chunked transfer
+        encoding. If given, 'progress' is called after each chunk sent with
+        the bytes sent so far, the total bytes (None if unknown) and the
+        throughput in bytes per second.
+
+        Returns the name of the file if successfully uploaded, None
+        otherwise."""
+        self.join()
+        if isinstance(path_or_fileobj, basestring):
+            filename = path_or_fileobj
+            fileobj = open(path_or_fileobj, 'rb')
+        else:
+            filename = getattr(path_or_fileobj, 'name', 'upload')
+            fileobj = path_or_fileobj
+        try:
+            response = self._upload(
+                'upload.cgi/room/%s/uploads/new' % self.id, fileobj,
+                filename, {'submit': 'Upload'}, progress)
+        finally:
+            if fileobj is not path_or_fileobj:
+                fileobj.close()
+        if self._verify_response(response, success=True):
+            return os.path.basename(filename)
+
     def messages(self):
         """Gets new messages.
 
@@ -184,7 +215,9 @@ class Room(object):
          * id: the id of the message
          * person: the name of the person who wrote the message if any
          * user_id: the user id of the person if any
-         * message: the message itself if any"""
+         * message: the message itself if any
+         * kind: the kind of message (e.g. text, paste, enter, leave, kick) if
+           known"""
         data = dict(l=self.last_cache_id, m=self.membership_key,
                     s=self.timestamp, t=int(time.time()))
         response = self._post("poll.fcgi", data, ajax=True)
@@ -203,9 +236,15 @@ class Room(object):
             if not id_match:
                 continue
 
+            kind_match = re.search(r'class=\\"(\w+)_message', line)
+            kind = None
+            if kind_match:
+                kind = kind_match.groups(0)[0]
+
             try:
                 messages.append(dict(
                     id = id_match.groups(0)[0],
+                    kind = kind,
                     user_id = re.search(r'user_(\d+)', line).groups(0)[0],
                     person = re.search(r'\\u003Ctd class=\\"person\\"\\u003E(?:\\u003Cspan\\u003E)?(.+?)(?:\\u003C\/span\\u003E)?\\u003C\/td\\u003E', line).groups(0)[0],
                     message = re.search(r'\\u003Ctd class=\\"body\\"\\u003E\\u003Cdiv\\u003E(.+?)\\u003C\/div\\u003E\\u003C\/td\\u003E', line).groups(0)[0]
@@ -0,0 +1,293 @@
+"""
+Listens to many Campfire rooms from several processes.
+"""
+import time
+
+try:
+    from hashlib import md5
+except ImportError: # python < 2.5
+    from md5 import new as md5
+
+try:
+    import multiprocessing
+    from Queue import Empty
+except ImportError: # python < 2.6
+    multiprocessing = None
+
+import campfire
+
+def shard(room_id, workers):
+    """Picks the worker, among the given worker names, listening to the room
+    with the given id.
+
+    Every worker scores the room with a hash of both their names and the
+    highest score wins, so adding a worker only moves the rooms the new
+    worker wins and removing one only moves the rooms it had.
+
+    Returns the name of the worker, None if there are no workers."""
+    best = best_score = None
+    for worker in workers:
+        score = md5('%s:%s' % (worker, room_id)).hexdigest()
+        if best_score is None or score > best_score:
+            best, best_score = worker, score
+    return best
+
+def _listen(worker, subdomain, ssl, email, password, cache_ids, queue, stop,
+        interval):
+    # runs in the worker process, with its own Campfire session
+    try:
+        _poll_rooms(worker, subdomain, ssl, email, password, cache_ids, queue,
+            stop, interval)
+    except Exception, e:
+        queue.put(('error', worker, '%s: %s' % (e.__class__.__name__, e)))
+        raise
+
+def _poll_rooms(worker, subdomain, ssl, email, password, cache_ids, queue,
+        stop, interval):
+    session = campfire.Campfire(subdomain, ssl)
+    if not session.login(email, password):
+        queue.put(('error', worker, 'Login failed'))
+        return
+    rooms = []
+    for room_id, last_cache_id in cache_ids.items():
+        room = campfire.Room(session, room_id)
+        if not room.join():
+            queue.put(('error', worker, 'Could not join room %s' % room_id))
+            return
+        if last_cache_id is not None:
+            room.last_cache_id = last_cache_id
+        rooms.append(room)
+
+    while not stop.is_set():
+        for room in rooms:
+            messages = room.messages()
+            if messages:
+                queue.put(('messages', worker,
+                    (room.id, room.last_cache_id, messages)))
+        stop.wait(interval)
+
+class Supervisor(object):
+    """Listens to the rooms of the Campfire account with the given subdomain
+    from a number of 'workers' processes (default: one per CPU), each logged
+    in with its own session.
+
+    Rooms are spread between the workers with shard(), so a room stays on
+    the same worker when workers are added or removed. The messages of all
+    the workers are merged into a single stream, in order within each room.
+    Workers that die are restarted from the last cache id seen for each of
+    their rooms, so no message is lost and none is delivered twice.
+
+    A worker that keeps dying (e.g. because the login fails) is restarted
+    after 'restart_delay' seconds, doubling on each failure in a row, and
+    given up after 'max_restarts' failures in a row; see failures()."""
+    def __init__(self, subdomain, email, password, ssl=False, workers=None,
+            interval=3, restart_delay=1, max_restarts=5):
+        if multiprocessing is None:
+            raise ImportError, 'Supervisor requires the multiprocessing module'
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        #: The number of seconds between two polls of the same room.
+        self.interval = interval
+        #: The number of seconds before restarting a worker that died.
+        self.restart_delay = restart_delay
+        #: The number of failures in a row after which a worker is given up.
+        self.max_restarts = max_restarts
+        self._failures = {}
+        self._credentials = (subdomain, ssl, email, password)
+        self._workers = ['worker-%d' % i for i in range(workers)]
+        self._next_worker = workers
+        self._processes = {}
+        self._cache_ids = {}
+        self._last_ids = {}
+        self._delivered = []
+        self._queue = multiprocessing.Queue()
+
+    def __repr__(self):
+        return "<Supervisor: %s>" % self._credentials[0]
+
+    def add_room(self, room_id, last_cache_id=None):
+        """Starts listening to the room with the given id, from the given
+        cache id if any."""
+        room_id = str(room_id)
+        before = self.assignments()
+        self._cache_ids[room_id] = last_cache_id
+        self._last_ids.setdefault(room_id, None)
+        self._rebalance(before)
+
+    def remove_room(self, room_id):
+        """Stops listening to the room with the given id."""
+        room_id = str(room_id)
+        before = self.assignments()
+        del self._cache_ids[room_id]
+        del self._last_ids[room_id]
+        self._rebalance(before)
+
+    def add_worker(self):
+        """Adds a worker process, moving some of the rooms to it.
+
+        Returns the name of the new worker."""
+        before = self.assignments()
+        worker = 'worker-%d' % self._next_worker
+        self._next_worker += 1
+        self._workers.append(worker)
+        self._rebalance(before)
+        return worker
+
+    def remove_worker(self, worker):
+        """Removes the given worker process, moving its rooms to the others."""
+        before = self.assignments()
+        self._workers.remove(worker)
+        self._stop_worker(worker)
+        self._rebalance(before)
+
+    def assignments(self):
+        """Maps the workers to the rooms they listen to.
+
+        Returns a dictionary of the sorted lists of room ids by worker name."""
+        result = {}
+        for worker in self._workers:
+            result[worker] = []
+        for room_id in self._cache_ids.keys():
+            result[shard(room_id, self._workers)].append(room_id)
+        for room_ids in result.values():
+            room_ids.sort()
+        return result
+
+    def cache_ids(self):
+        """Gets the progress of each room, to be given back to add_room()
+        when starting over.
+
+        Returns a dictionary of the last cache ids by room id."""
+        return self._cache_ids.copy()
+
+    def failures(self):
+        """Gets the workers that died and have not recovered since.
+
+        Returns a dictionary by worker name of:
+         * count: the number of failures in a row
+         * error: the last error reported by the worker, if any
+         * given_up: True if the worker won't be restarted any more"""
+        result = {}
+        for worker, failure in self._failures.items():
+            result[worker] = dict(count=failure['count'],
+                error=failure['error'],
+                given_up=failure['count'] > self.max_restarts)
+        return result
+
+    def start(self):
+        """Starts the worker processes, except the ones waiting to be
+        restarted or given up."""
+        now = time.time()
+        for worker, room_ids in self.assignments().items():
+            if not room_ids or worker in self._processes:
+                continue
+            failure = self._failures.get(worker)
+            if failure and (failure['count'] > self.max_restarts or
+                    failure['retry_at'] > now):
+                continue
+            self._start_worker(worker, room_ids)
+
+    def stop(self):
+        """Stops the worker processes."""
+        for worker in self._processes.keys():
+            self._stop_worker(worker)
+
+    def messages(self, timeout=1):
+        """Gets the new messages of any room, waiting at most 'timeout'
+        seconds for some to arrive. Restarts the workers that died.
+
+        Returns a list of (room id, message data) tuples."""
+        self._restart_dead_workers()
+        # messages read while stopping workers come first
+        result, self._delivered = self._delivered, []
+        try:
+            item = self._queue.get(not result, timeout)
+            while True:
+                result.extend(self._receive(item))
+                item = self._queue.get(False)
+        except Empty:
+            pass
+        return result
+
+    def _receive(self, item):
+        kind, worker, data = item
+        if kind == 'error':
+            failure = self._failures.setdefault(worker,
+                dict(count=0, error=None, retry_at=0))
+            failure['error'] = data
+            return []
+        self._failures.pop(worker, None)
+        return self._deliver(*data)
+
+    def _deliver(self, room_id, last_cache_id, messages):
+        room_id = str(room_id)
+        if room_id not in self._cache_ids:
+            return []
+        if self._cache_ids[room_id] is None or \
+                int(last_cache_id) > int(self._cache_ids[room_id]):
+            self._cache_ids[room_id] = last_cache_id
+
+        result = []
+        for message in messages:
+            id = int(message['id'])
+            if self._last_ids[room_id] is None or id > self._last_ids[room_id]:
+                self._last_ids[room_id] = id
+                result.append((room_id, message))
+        return result
+
+    def _rebalance(self, before):
+        if not self._processes:
+            return
+        after = self.assignments()
+        for worker in self._processes.keys():
+            if after.get(worker) != before.get(worker):
+                self._stop_worker(worker)
+        self.start()
+
+    def _restart_dead_workers(self):
+        now = time.time()
+        for worker, (process, stop) in self._processes.items():
+            if not process.is_alive():
+                del self._processes[worker]
+                failure = self._failures.setdefault(worker,
+                    dict(count=0, error=None, retry_at=0))
+                failure['count'] += 1
+                failure['retry_at'] = now + \
+                    self.restart_delay * 2 ** (failure['count'] - 1)
+                if failure['error'] is None:
+                    failure['error'] = 'Exited with code %s' % process.exitcode
+        self.start()
+
+    def _start_worker(self, worker, room_ids):
+        cache_ids = {}
+        for room_id in room_ids:
+            cache_ids[room_id] = self._cache_ids[room_id]
+        stop = multiprocessing.Event()
+        process = multiprocessing.Process(target=_listen, name=worker,
+            args=(worker,) + self._credentials + (cache_ids, self._queue, stop,
+            self.interval))
+        process.daemon = True
+        process.start()
+        self._processes[worker] = (process, stop)
+
+    def _stop_worker(self, worker):
+        try:
+            process, stop = self._processes.pop(worker)
+        except KeyError:
+            return
+        stop.set()
+        # a worker can't exit before the queue takes what it has put, so
+        # keep reading it meanwhile
+        deadline = time.time() + self.interval * 2 + 5
+        while process.is_alive() and time.time() < deadline:
+            try:
+                item = self._queue.get(True, 0.1)
+            except Empty:
+                continue
+            self._delivered.extend(self._receive(item))
+        process.join(max(deadline - time.time(), 0))
+        if process.is_alive():
+            process.terminate()
+
+
+__all__ = ['Supervisor', 'shard']
@@ -0,0 +1,93 @@
+"""
+Keeps a local copy of the Campfire transcripts.
+"""
+from room import Room
+
+class TranscriptStore(object):
+    """Stores the transcripts by room and date, along with the high-water
+    mark of each room: the last day whose transcript is complete.
+
+    Keeps everything in the given mapping, which can be a
+    U{shelve<http://docs.python.org/lib/module-shelve.html>} to keep the
+    transcripts on disk (default: a dictionary)."""
+    def __init__(self, mapping=None):
+        if mapping is None:
+            mapping = {}
+        self._mapping = mapping
+
+    def high_water(self, room_id):
+        """Gets the high-water mark of the room with the given id.
+
+        Returns a date, None if nothing has been synced yet."""
+        return self._mapping.get('%s/high_water' % room_id)
+
+    def set_high_water(self, room_id, date):
+        """Sets the high-water mark of the room with the given id."""
+        self._mapping['%s/high_water' % room_id] = date
+
+    def transcript(self, room_id, date):
+        """Gets the stored transcript of the given room and date.
+
+        Returns a list of message data like Room.transcript(), None if not
+        stored."""
+        return self._mapping.get('%s/%s' % (room_id, date.isoformat()))
+
+    def save(self, room_id, date, transcript):
+        """Stores the transcript of the given room and date."""
+        self._mapping['%s/%s' % (room_id, date.isoformat())] = transcript
+
+class TranscriptSync(object):
+    """Downloads the transcripts of the given Campfire into the given store
+    (default: a new TranscriptStore), only fetching the days after the
+    high-water mark of each room. The most recent day listed is fetched on
+    every run since its transcript may still be growing: the days are those
+    of the server, which may be behind the local one."""
+    def __init__(self, campfire, store=None):
+        #: The TranscriptStore holding the transcripts.
+        self.store = store
+        if store is None:
+            self.store = TranscriptStore()
+        self._campfire = campfire
+
+    def sync(self, *room_ids):
+        """Downloads the new transcripts of the rooms with the given ids, or
+        of all the rooms if none is given.
+
+        Returns a dictionary of the dates downloaded by room id."""
+        if room_ids:
+            dates_by_room = {}
+            for room_id in room_ids:
+                dates_by_room[str(room_id)] = \
+                    self._campfire.transcripts(room_id)
+        else:
+            dates_by_room = self._campfire.transcripts()
+
+        result = {}
+        for room_id, dates in dates_by_room.items():
+            result[room_id] = self.sync_dates(room_id, dates)
+        return result
+
+    def sync_dates(self, room_id, dates):
+        """Downloads the transcripts of the room with the given id among the
+        given dates, skipping the ones up to the high-water mark.
+
+        Returns the list of the dates downloaded, sorted."""
+        high_water = self.store.high_water(room_id)
+        room = Room(self._campfire, room_id)
+
+        fetched = []
+        for date in dates:
+            if high_water is None or date > high_water:
+                fetched.append(date)
+        fetched.sort()
+
+        newest = fetched and max(dates)
+        for date in fetched:
+            self.store.save(room_id, date, room.transcript(date))
+            # a day is complete once a later one has been listed
+            if date < newest:
+                self.store.set_high_water(room_id, date)
+        return fetched
+
+
+__all__ = ['TranscriptStore', 'TranscriptSync']
@@ -1,4 +1,5 @@
 from httplib import HTTPConnection
+from StringIO import StringIO
 import unittest
 from urlparse import urlparse
 
@@ -118,6 +119,19 @@ class CampfireTest(unittest.TestCase):
         users = self.campfire.users()
         self.assertEqual(['Tom Jones', 'Gloria Estefan'], list(users))
 
+    def test_users_rooms_first_empty(self):
+        utils.FIXTURE = 'chat_rooms_first_empty'
+        self.assertEqual(['Gloria Estefan'], list(self.campfire.users()))
+        self.assertEqual(['Gloria Estefan'],
+            list(self.campfire.users('Room B')))
+
+    def test_users_by_room(self):
+        utils.FIXTURE = 'chat_rooms_one_empty'
+        users = self.campfire.users_by_room()
+        self.assertEqual(['Room A', 'Room B'], sorted(users.keys()))
+        self.assertEqual(['Tom Jones'], list(users['Room A']))
+        self.assert_(not users['Room B'])
+
     def test_rooms_names(self):
         utils.FIXTURE = 'rooms_names'
         self.assertEqual(['Room A', 'Room B'], self.campfire.rooms_names())
@@ -151,6 +165,69 @@ class CampfireTest(unittest.TestCase):
         transcripts = self.campfire.transcripts()
         self.assertEqual({}, transcripts)
 
+    def upload(self, fileobj, **options):
+        sent = []
+        headers = {}
+        self.timeouts = []
+        timeouts = self.timeouts
+        class FakeSocket(object):
+            def settimeout(self, timeout):
+                timeouts.append(timeout)
+            def close(self):
+                pass
+        saved = (HTTPConnection.connect, HTTPConnection.send,
+            HTTPConnection.putheader, HTTPConnection.endheaders)
+        HTTPConnection.connect = \
+            lambda self: setattr(self, 'sock', FakeSocket())
+        HTTPConnection.send = lambda self, data: sent.append(data)
+        HTTPConnection.putheader = \
+            lambda self, name, value: headers.__setitem__(name, value)
+        HTTPConnection.endheaders = lambda self, *args: None
+        try:
+            response = self.campfire._upload('upload.cgi/room/1/uploads/new',
+                fileobj, 'build.log', {'submit': 'Upload'}, chunk_size=4,
+                **options)
+        finally:
+            (HTTPConnection.connect, HTTPConnection.send,
+                HTTPConnection.putheader, HTTPConnection.endheaders) = saved
+        self.assertEqual(200, response.status)
+        return sent, headers
+
+    def test_upload(self):
+        utils.FIXTURE = 'default'
+        progress = []
+        fileobj = StringIO('skip' + 'x' * 10)
+        fileobj.seek(4)
+        sent, headers = self.upload(fileobj,
+            progress=lambda *args: progress.append(args))
+        self.assertEqual([5], self.timeouts)
+        self.assertEqual(['xxxx', 'xxxx', 'xx'], sent[1:-1])
+        self.assert_('name="submit"' in sent[0])
+        self.assert_('filename="build.log"' in sent[0])
+        self.assert_(sent[-1].endswith('--\r\n'))
+        total = len(''.join(sent))
+        self.assertEqual(str(total), headers['Content-length'])
+        self.assertEqual(5, len(progress))
+        self.assertEqual((total, total), progress[-1][:2])
+
+    def test_upload_pipe(self):
+        utils.FIXTURE = 'default'
+        class Pipe(StringIO):
+            def seek(self, *args):
+                raise IOError(29, 'Illegal seek')
+        sent, headers = self.upload(Pipe('x' * 6), timeout=10)
+        self.assertEqual([10], self.timeouts)
+        self.assertEqual('chunked', headers['Transfer-Encoding'])
+        self.assert_('Content-length' not in headers)
+        self.assertEqual(['4\r\nxxxx\r\n', '2\r\nxx\r\n'], sent[1:3])
+        self.assertEqual('0\r\n\r\n', sent[-1])
+
+    def test_quote_filename(self):
+        self.assertEqual('a\\"b\\\\c.txt',
+            self.campfire._quote_filename('/tmp/a"b\\c\r\n.txt'))
+        self.assertEqual('caf\xc3\xa9',
+            self.campfire._quote_filename(u'caf\xe9'))
+
 
 if __name__ == '__main__':
     unittest.main()
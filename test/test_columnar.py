@@ -0,0 +1,84 @@
+import datetime
+import shutil
+import tempfile
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pinder import MessageTable, load_table
+from utils import message
+
+
+class MessageTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = MessageTable()
+        self.table.append([
+            message(1, u'hello', u'Tom', user_id='10'),
+            message(2, u'caf\xe9', u'Gloria', user_id='20'),
+            message(3, '', None, user_id=None)], room_id=5, timestamp=3600)
+        self.table.append([
+            dict(message(4, u'bye', u'Tom', user_id='10'), timestamp=7300)],
+            room_id=6)
+
+    def test_columns(self):
+        self.assertEqual(4, len(self.table))
+        self.assertEqual([1, 2, 3, 4], list(self.table.column('id')))
+        self.assertEqual([10, 20, -1, 10], list(self.table.column('user_id')))
+        self.assertEqual([0, 1, -1, 0], list(self.table.column('person')))
+        self.assertEqual(u'Gloria', self.table.person(1))
+
+    def test_message(self):
+        self.assertEqual(dict(id=2, user_id=20, room_id=5, timestamp=3600,
+            person=u'Gloria', message=u'caf\xe9'), self.table.message(1))
+        self.assertEqual(None, self.table.message(2)['message'])
+        self.assertEqual(u'bye', self.table.message(3)['message'])
+        self.assertEqual(self.table.message(3), self.table.message(-1))
+        self.assertRaises(IndexError, self.table.message, 4)
+        self.assertRaises(IndexError, self.table.message, -5)
+
+    def test_big_ids(self):
+        table = MessageTable()
+        table.append([message(2 ** 53 + 1, u'hi', u'Tom',
+            user_id=str(2 ** 62 + 1))])
+        self.assertEqual(2 ** 53 + 1, table.column('id')[0])
+        self.assertEqual(2 ** 62 + 1, table.message(0)['user_id'])
+
+    def test_count_by(self):
+        keys, counts = self.table.count_by('user_id')
+        self.assertEqual([-1, 10, 20], list(keys))
+        self.assertEqual([1, 2, 1], list(counts))
+        keys, counts = self.table.count_by('room_id', bucket=3600)
+        self.assertEqual([[5, 3600], [6, 7200]], keys.tolist())
+        self.assertEqual([3, 1], list(counts))
+
+    def test_date_timestamp(self):
+        table = MessageTable()
+        date = datetime.date(2001, 1, 1)
+        table.append([message(1, u'hi', u'Tom', user_id='1')], timestamp=date)
+        self.assertEqual(date,
+            datetime.date.fromtimestamp(table.column('timestamp')[0]))
+
+    def test_save_and_load(self):
+        path = tempfile.mkdtemp()
+        try:
+            self.table.save(path)
+            table = load_table(path)
+            self.assert_(isinstance(table.column('id'), numpy.memmap))
+            for index in range(4):
+                self.assertEqual(self.table.message(index),
+                    table.message(index))
+            table.append([message(5, u'again', u'Gloria', user_id='20')])
+            self.assertEqual(1, table.column('person')[-1])
+            self.assertEqual(u'again', table.message(4)['message'])
+        finally:
+            shutil.rmtree(path)
+
+if numpy is None:
+    del MessageTableTest
+
+
+if __name__ == '__main__':
+    unittest.main()
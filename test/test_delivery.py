@@ -0,0 +1,81 @@
+import datetime
+import unittest
+
+from pinder import MessageBuffer
+from utils import FakeRoom, message
+
+def ids(messages):
+    return [int(m['id']) for m in messages]
+
+
+class MessageBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.room = FakeRoom()
+        self.buffer = MessageBuffer(self.room)
+        self.today = datetime.date.today()
+
+    def test_feed_sorts_and_removes_duplicates(self):
+        self.assertEqual([1, 2, 3], ids(self.buffer.feed(
+            [message(3), message(1), message(2), message(1)])))
+        self.assertEqual([4], ids(self.buffer.feed([message(2), message(4)])))
+        self.assertEqual(4, self.buffer.last_id)
+        self.assertEqual(self.today, self.buffer.last_date)
+
+    def test_feed_drops_late_messages(self):
+        self.buffer.feed([message(10)])
+        self.assertEqual([], self.buffer.feed([message(7), message(10)]))
+        self.assertEqual(1, self.buffer.late)
+        self.assert_(self.buffer.seen(7))
+        self.assert_(not self.buffer.seen(11))
+
+    def test_messages_without_gap(self):
+        self.room.stream.append(message(1))
+        self.assertEqual([1], ids(self.buffer.messages()))
+        self.room.stream.extend([message(1), message(2)])
+        self.assertEqual([2], ids(self.buffer.messages()))
+        self.assertEqual([], self.room.fetched)
+
+    def test_messages_backfills_after_rejoin(self):
+        self.room.stream.append(message(100))
+        self.buffer.messages()
+        self.room.stream.append(message(103))
+        self.room.last_cache_id = '9' # joined again
+        # 5 and 50 were posted before the buffer started
+        self.room.by_date[self.today] = [
+            message(5), message(50), message(100), message(101),
+            message(102)]
+        self.assertEqual([101, 102, 103], ids(self.buffer.messages()))
+        self.assertEqual(0, self.buffer.late)
+
+    def test_messages_resumes_from_last_date(self):
+        yesterday = self.today - datetime.timedelta(days=1)
+        buffer = MessageBuffer(self.room, last_id='2', last_date=yesterday)
+        self.room.stream.append(message(5))
+        self.room.by_date[yesterday] = [message(2), message(3)]
+        self.room.by_date[self.today] = [message(4)]
+        self.assertEqual([3, 4, 5], ids(buffer.messages()))
+        self.assertEqual([yesterday - datetime.timedelta(days=1), yesterday,
+            self.today], self.room.fetched)
+
+    def test_messages_resumes_from_server_day_before(self):
+        # the local day started before the server one
+        yesterday = self.today - datetime.timedelta(days=1)
+        buffer = MessageBuffer(self.room, last_id='2', last_date=self.today)
+        self.room.stream.append(message(4))
+        self.room.by_date[yesterday] = [message(2), message(3)]
+        self.assertEqual([3, 4], ids(buffer.messages()))
+
+    def test_messages_resumes_from_last_id(self):
+        buffer = MessageBuffer(self.room, last_id='2')
+        long_ago = self.today - datetime.timedelta(days=30)
+        yesterday = self.today - datetime.timedelta(days=1)
+        self.room.stream.append(message(5))
+        self.room.by_date[long_ago] = [message(1)]
+        self.room.by_date[yesterday] = [message(2), message(3)]
+        self.room.by_date[self.today] = [message(4)]
+        self.assertEqual([3, 4, 5], ids(buffer.messages()))
+        self.assertEqual([self.today, yesterday], self.room.fetched)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import re
+import unittest
+
+from pinder import Dispatcher
+from pinder.dispatcher import _strip_groups
+from utils import FakeRoom, message
+
+
+class DispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = Dispatcher(workers=0)
+        self.calls = []
+        self.room = FakeRoom(1)
+
+    def handler(self, name):
+        def _handler(room, message, match):
+            self.calls.append((name, match.groups()))
+        _handler.__name__ = name
+        return _handler
+
+    def test_match_first_in_message(self):
+        self.dispatcher.register(r'deploy (\w+)', self.handler('deploy'))
+        self.dispatcher.register(r'!(\w+)', self.handler('bang'))
+        self.dispatcher.dispatch(self.room, message(1, '!ping deploy app'))
+        self.dispatcher.dispatch(self.room, message(1, 'deploy app !ping'))
+        self.assertEqual([('bang', ('ping',)), ('deploy', ('app',))],
+            self.calls)
+
+    def test_tie_goes_to_first_registered(self):
+        self.dispatcher.register(r'hello', self.handler('first'))
+        self.dispatcher.register(r'hel+o', self.handler('second'))
+        self.dispatcher.dispatch(self.room, message(1, 'hello'))
+        self.assertEqual([('first', ())], self.calls)
+
+    def test_flags(self):
+        self.dispatcher.register(r'HELLO', self.handler('exact'))
+        self.dispatcher.register(r'hello', self.handler('nocase'),
+            flags=re.IGNORECASE)
+        self.dispatcher.dispatch(self.room, message(1, 'Hello'))
+        self.assertEqual([('nocase', ())], self.calls)
+
+    def test_room_handlers(self):
+        self.dispatcher.register(r'hello', self.handler('room'), room=2)
+        self.assertEqual(None,
+            self.dispatcher.dispatch(self.room, message(1, 'hello')))
+        self.assert_(self.dispatcher.dispatch(FakeRoom(2),
+            message(1, 'hello')))
+
+    def test_no_message(self):
+        self.dispatcher.register(r'.*', self.handler('any'))
+        self.assertEqual(None, self.dispatcher.dispatch(self.room,
+            dict(id='1', user_id=None, person=None, message=None)))
+
+    def test_poll_with_workers(self):
+        dispatcher = Dispatcher(workers=2)
+        dispatcher.register(r'\d+', self.handler('number'))
+        def fail(room, message, match):
+            raise ValueError
+        dispatcher.register(r'fail', fail)
+        dispatcher.start()
+        room = FakeRoom(1, stream=[message(1, '1'), message(1, 'fail'),
+            message(1, 'no')])
+        self.assertEqual(2, dispatcher.poll(room))
+        dispatcher.stop()
+        stats = dispatcher.stats()
+        self.assertEqual(['number', 'fail'], [s['name'] for s in stats])
+        self.assertEqual(1, stats[0]['calls'])
+        self.assertEqual(0, stats[0]['errors'])
+        self.assertEqual(None, stats[0]['error'])
+        self.assertEqual(1, stats[1]['errors'])
+        self.assert_('ValueError' in stats[1]['error'])
+        self.assert_('in fail' in stats[1]['error'])
+
+    def test_stats_per_registration(self):
+        self.dispatcher.register(r'a', lambda room, message, match: None)
+        self.dispatcher.register(r'b', lambda room, message, match: None)
+        self.dispatcher.dispatch(self.room, message(1, 'a'))
+        stats = self.dispatcher.stats()
+        self.assertEqual([1, 0], [s['calls'] for s in stats])
+        self.assertEqual(['a', 'b'], [s['pattern'] for s in stats])
+
+    def test_same_group_names(self):
+        self.dispatcher.register(r'deploy (?P<app>\w+)',
+            self.handler('deploy'))
+        self.dispatcher.register(r'restart (?P<app>\w+)',
+            self.handler('restart'))
+        self.dispatcher.dispatch(self.room, message(1, 'restart web'))
+        self.assertEqual([('restart', ('web',))], self.calls)
+
+    def test_many_handlers(self):
+        for i in range(150):
+            self.dispatcher.register(r'cmd%d (\w+) (\w+)' % i,
+                self.handler('cmd%d' % i))
+        self.dispatcher.dispatch(self.room, message(1, 'cmd120 a b'))
+        self.dispatcher.dispatch(self.room,
+            message(1, 'x cmd3 c d cmd140 e f'))
+        self.assertEqual([('cmd120', ('a', 'b')), ('cmd3', ('c', 'd'))],
+            self.calls)
+
+    def test_backreferences(self):
+        self.dispatcher.register(r'(\w+) is \1', self.handler('tautology'))
+        self.dispatcher.register(r'(?P<w>\w+) or (?P=w)', self.handler('or'))
+        self.dispatcher.register(r'(\w+) vs (\w+)', self.handler('versus'))
+        self.dispatcher.dispatch(self.room, message(1, 'cats is cats'))
+        self.dispatcher.dispatch(self.room, message(1, 'dogs or dogs'))
+        self.dispatcher.dispatch(self.room, message(1, 'dogs vs cats'))
+        self.assertEqual(['tautology', 'or', 'versus'],
+            [name for name, groups in self.calls])
+
+    def test_verbose_comments(self):
+        self.dispatcher.register(r'deploy \s+ (\w+)  # the app (or [site',
+            self.handler('deploy'), flags=re.VERBOSE)
+        self.dispatcher.register(r'(?x) restart \s+ (\w+)  # the app',
+            self.handler('restart'))
+        self.dispatcher.register(r'hello', self.handler('hello'))
+        self.dispatcher.dispatch(self.room, message(1, 'restart web'))
+        self.dispatcher.dispatch(self.room, message(1, 'deploy api'))
+        self.dispatcher.dispatch(self.room, message(1, 'hello'))
+        self.assertEqual([('restart', ('web',)), ('deploy', ('api',)),
+            ('hello', ())], self.calls)
+
+    def test_strip_groups(self):
+        self.assertEqual(r'(?:a)(?:b)[(]\((?=c)(?i)',
+            _strip_groups(r'(a)(?P<x>b)[(]\((?=c)(?i)'))
+        self.assertEqual(r'[]()]', _strip_groups(r'[]()]'))
+        self.assertEqual(None, _strip_groups(r'(a)\1'))
+        self.assertEqual(None, _strip_groups(r'(a)(?(1)b|c)'))
+        self.assertEqual(r'\0', _strip_groups(r'\0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
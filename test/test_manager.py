@@ -0,0 +1,61 @@
+import unittest
+
+from pinder import Manager
+from utils import FakeRoom, message
+
+
+class ManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = Manager()
+        self.foo = self.manager.add('foo')
+        self.bar = self.manager.add('bar')
+
+    def test_add(self):
+        self.assert_(self.foo is self.manager.add('foo'))
+        self.assert_(self.foo._http_client is self.bar._http_client)
+        self.assertEqual([self.foo, self.bar], self.manager.campfires())
+        self.assert_(self.manager.remove('foo') is self.foo)
+        self.assertEqual([self.bar], self.manager.campfires())
+
+    def test_poll_is_fair(self):
+        rooms = [FakeRoom(id, campfire=self.foo) for id in (1, 2, 3)]
+        rooms.append(FakeRoom(4, campfire=self.bar))
+        for room in rooms:
+            self.manager.watch(room)
+        polled = []
+        for i in range(3):
+            for room in rooms:
+                room.stream.append(message(i))
+            polled.append([room.id for room, messages in self.manager.poll()])
+        self.assertEqual([[1, 4], [4, 2], [3, 4]], polled)
+        self.assertEqual([self.foo, self.bar], self.manager.campfires())
+        self.assertEqual('<Manager: foo, bar>', repr(self.manager))
+        metrics = self.manager.metrics()
+        self.assertEqual(3, metrics['foo']['polls'])
+        self.assertEqual(3, metrics['bar']['messages'])
+
+    def test_poll_errors(self):
+        self.manager.watch(FakeRoom(1, campfire=self.foo, fail=True))
+        self.manager.watch(FakeRoom(2, campfire=self.bar, stream=[message()]))
+        self.assertEqual(1, len(self.manager.poll()))
+        self.assertEqual(1, self.manager.metrics()['foo']['errors'])
+
+    def test_heartbeat(self):
+        room = FakeRoom(1, campfire=self.foo)
+        self.manager.watch(room)
+        self.assert_(self.manager.heartbeat())
+        self.assert_(not self.manager.heartbeat())
+        self.assert_(self.manager.heartbeat(force=True))
+        self.assertEqual(2, room.pings)
+        self.assertEqual(2, self.manager.metrics()['foo']['pings'])
+
+    def test_heartbeat_errors(self):
+        self.manager.watch(FakeRoom(1, campfire=self.foo, fail=True))
+        self.manager.heartbeat()
+        metrics = self.manager.metrics()['foo']
+        self.assertEqual(0, metrics['pings'])
+        self.assertEqual(1, metrics['errors'])
+
+
+if __name__ == '__main__':
+    unittest.main()
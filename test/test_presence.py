@@ -0,0 +1,89 @@
+import unittest
+
+from pinder import Presence
+from utils import FakeRoom, message
+
+
+class FakeCampfire(object):
+    def __init__(self):
+        self.lobby = {}
+
+    def users_by_room(self):
+        return dict([(name, set(users)) for name, users in self.lobby.items()])
+
+
+class PresenceTest(unittest.TestCase):
+    def setUp(self):
+        self.campfire = FakeCampfire()
+        self.presence = Presence(self.campfire, interval=60)
+        self.room = FakeRoom(name='Room A')
+        self.changes = []
+        self.presence.subscribe(
+            lambda *change: self.changes.append(change))
+
+    def test_refresh_emits_diffs(self):
+        self.campfire.lobby = {'Room A': ['Tom'], 'Room B': []}
+        self.assert_(self.presence.refresh())
+        self.assertEqual([('Room A', set(['Tom']), set())], self.changes)
+        self.campfire.lobby = {'Room A': ['Gloria'], 'Room B': ['Tom']}
+        self.presence.refresh(force=True)
+        self.assertEqual([('Room A', set(['Gloria']), set(['Tom'])),
+            ('Room B', set(['Tom']), set())], sorted(self.changes[1:]))
+        self.assertEqual(set(['Tom', 'Gloria']), self.presence.users())
+
+    def test_refresh_interval(self):
+        self.presence.refresh()
+        self.campfire.lobby = {'Room A': ['Tom']}
+        self.assert_(not self.presence.refresh())
+        self.assertEqual([], self.changes)
+
+    def test_room_removed_from_lobby(self):
+        self.campfire.lobby = {'Room A': ['Tom']}
+        self.presence.refresh()
+        self.campfire.lobby = {}
+        self.presence.refresh(force=True)
+        self.assertEqual(('Room A', set(), set(['Tom'])), self.changes[-1])
+
+    def test_feed(self):
+        self.presence.feed(self.room, [
+            message(1, 'has entered the room', 'Tom'),
+            message(1, 'has entered the room', 'Gloria'),
+            message(1, 'hello', 'Tom'),
+            message(1, 'has left the room', 'Gloria')])
+        self.assertEqual([('Room A', set(['Tom']), set())], self.changes)
+        self.assertEqual(set(['Tom']), self.presence.users('Room A'))
+
+    def test_feed_ignores_chat(self):
+        self.presence.feed(self.room, [
+            message(1, 'has entered the room', 'Tom', kind='enter'),
+            message(1, 'lol Bob has left the room', 'Tom'),
+            message(1, 'has left the room', 'Tom', kind='text')])
+        self.assertEqual(set(['Tom']), self.presence.users('Room A'))
+
+    def test_feed_with_kind(self):
+        self.presence.feed(self.room,
+            [message(1, 'whatever', 'Tom', kind='enter')])
+        self.assertEqual(set(['Tom']), self.presence.users('Room A'))
+        self.presence.feed(self.room,
+            [message(1, 'whatever', 'Tom', kind='leave')])
+        self.assertEqual(set(), self.presence.users('Room A'))
+
+    def test_feed_kick(self):
+        self.presence.feed(self.room,
+            [message(1, 'whatever', 'Tom', kind='enter')])
+        self.presence.feed(self.room,
+            [message(1, 'has left the room', 'Tom', kind='kick')])
+        self.assertEqual(set(), self.presence.users('Room A'))
+        self.assertEqual(('Room A', set(), set(['Tom'])), self.changes[-1])
+
+    def test_unsubscribe(self):
+        callback = self.presence._subscribers[0]
+        self.presence.unsubscribe(callback)
+        self.presence.feed(self.room,
+            [message(1, 'has entered the room', 'Tom')])
+        self.assertEqual([], self.changes)
+        self.assertRaises(ValueError, self.presence.unsubscribe, callback)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from pinder import Histogram, LatencyProbe
+from utils import FakeRoom
+
+
+class HistogramTest(unittest.TestCase):
+    def test_add(self):
+        histogram = Histogram(smallest=1, buckets=4)
+        for value in (0.5, 1.5, 3, 100):
+            histogram.add(value)
+        self.assertEqual([1, 1, 1, 1], histogram.counts)
+        self.assertEqual(0.5, histogram.min)
+        self.assertEqual(100, histogram.max)
+        self.assertEqual(26.25, histogram.mean())
+        self.assertEqual(2, histogram.percentile(50))
+        self.assertEqual(100, histogram.percentile(99))
+
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertEqual(None, histogram.mean())
+        self.assertEqual(None, histogram.percentile(50))
+
+
+class LatencyProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.probe = LatencyProbe(timeout=60)
+        stream = []
+        self.sender = FakeRoom(name='Room 1', stream=stream)
+        self.listener = FakeRoom(name='Room 1', stream=stream)
+        self.assertEqual(0, self.probe.add(self.sender, self.listener))
+
+    def test_send_and_poll(self):
+        self.assertEqual(1, self.probe.send())
+        self.sender.speak('pinder-probe unknown')
+        self.sender.speak('hello')
+        self.assertEqual(1, self.probe.poll())
+        self.assertEqual(0, self.probe.poll())
+        report = self.probe.report()[0]
+        self.assertEqual(1, report['sent'])
+        self.assertEqual(1, report['total']['count'])
+        self.assertEqual(1, report['detect']['count'])
+        self.assertEqual(1, self.probe.histograms(0)['send'].count)
+
+    def test_failed_and_lost(self):
+        self.sender.fail = True
+        self.assertEqual(0, self.probe.send())
+        self.sender.fail = False
+        self.probe.send()
+        self.listener.read = len(self.listener.stream) # never seen
+        self.probe.timeout = -1
+        self.probe.poll()
+        report = self.probe.report()[0]
+        self.assertEqual(1, report['failed'])
+        self.assertEqual(1, report['lost'])
+
+    def test_run(self):
+        report = self.probe.run(2, interval=0, poll_interval=0)
+        self.assertEqual(2, report[0]['total']['count'])
+
+    def test_rooms_with_same_name(self):
+        stream = []
+        self.assertEqual(1, self.probe.add(FakeRoom(2, stream=stream),
+            FakeRoom(2, stream=stream)))
+        self.probe.send()
+        self.probe.poll()
+        report = self.probe.report()
+        self.assertEqual([1, 2], [room['id'] for room in report])
+        self.assertEqual([1, 1], [room['total']['count'] for room in report])
+        self.assertEqual(None, report[1]['room'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -42,6 +42,15 @@ class RoomTest(unittest.TestCase):
         utils.FIXTURE = 'guest_url'
         self.assertEqual('99d14', self.room.guest_invite_code())
         
+    def test_messages(self):
+        utils.FIXTURE = 'poll'
+        messages = self.room.messages()
+        self.assertEqual('103', self.room.last_cache_id)
+        self.assertEqual(['enter', 'text', 'leave'],
+            [message['kind'] for message in messages])
+        self.assertEqual('Tom Jones', messages[0]['person'])
+        self.assertEqual('lol Bob has left the room', messages[1]['message'])
+
     def test_transcripts(self):
         utils.FIXTURE = 'transcripts'
         transcripts = self.room.transcripts()
@@ -0,0 +1,163 @@
+import os
+import time
+import unittest
+
+from pinder import Supervisor, shard
+from pinder import supervisor
+
+def crashing_listen(worker, subdomain, ssl, email, password, cache_ids,
+        queue, stop, interval):
+    # sends the message after the cache id of each room, dying the first time
+    for room_id, last_cache_id in cache_ids.items():
+        next_id = int(last_cache_id or 0) + 1
+        queue.put(('messages', worker, (room_id, str(next_id),
+            [dict(id=str(next_id), message='m')])))
+        if last_cache_id is None:
+            time.sleep(0.1) # let the queue flush before dying
+            os._exit(1)
+    stop.wait(5)
+
+def big_listen(worker, subdomain, ssl, email, password, cache_ids,
+        queue, stop, interval):
+    # puts more than a pipe holds, so exiting waits for the queue to be read
+    queue.put(('messages', worker, ('1', '1',
+        [dict(id='1', message='m' * 1000000)])))
+    stop.wait(5)
+
+def failing_listen(worker, subdomain, ssl, email, password, cache_ids,
+        queue, stop, interval):
+    queue.put(('error', worker, 'Login failed'))
+
+
+class ShardTest(unittest.TestCase):
+    def test_stable(self):
+        workers = ['worker-0', 'worker-1', 'worker-2']
+        for room_id in range(100):
+            self.assertEqual(shard(room_id, workers),
+                shard(str(room_id), list(reversed(workers))))
+        self.assertEqual(None, shard(1, []))
+
+    def test_adding_worker_only_moves_to_it(self):
+        workers = ['worker-0', 'worker-1', 'worker-2']
+        moved = 0
+        for room_id in range(200):
+            before = shard(room_id, workers)
+            after = shard(room_id, workers + ['worker-3'])
+            if before != after:
+                self.assertEqual('worker-3', after)
+                moved += 1
+        self.assert_(0 < moved < 100)
+
+
+class SupervisorTest(unittest.TestCase):
+    def setUp(self):
+        self.supervisor = Supervisor('foobar', 'foo', 'foopass', workers=2)
+
+    def test_assignments(self):
+        for room_id in range(10):
+            self.supervisor.add_room(room_id)
+        assignments = self.supervisor.assignments()
+        self.assertEqual(['worker-0', 'worker-1'], sorted(assignments.keys()))
+        self.assertEqual(10, sum([len(ids) for ids in assignments.values()]))
+        self.supervisor.remove_room(3)
+        self.assert_('3' not in self.supervisor.cache_ids())
+
+    def test_deliver_skips_delivered_messages(self):
+        self.supervisor.add_room(1, '10')
+        messages = [dict(id=str(id), message='m') for id in (5, 6)]
+        self.assertEqual(2, len(self.supervisor._deliver(1, '12', messages)))
+        self.assertEqual('12', self.supervisor.cache_ids()['1'])
+        # a restarted worker reads the same messages again
+        messages.append(dict(id='7', message='m'))
+        delivered = self.supervisor._deliver(1, '11', messages)
+        self.assertEqual([('1', messages[2])], delivered)
+        self.assertEqual('12', self.supervisor.cache_ids()['1'])
+        self.assertEqual([], self.supervisor._deliver(2, '1', messages))
+
+
+class FakeQueue(list):
+    put = list.append
+
+class FakeRoom(object):
+    def __init__(self, session, id):
+        self.id = id
+
+    def join(self):
+        return self.id != '2'
+
+class FakeCampfire(object):
+    def __init__(self, subdomain, ssl):
+        pass
+
+    def login(self, email, password):
+        return True
+
+
+class PollRoomsTest(unittest.TestCase):
+    def setUp(self):
+        self.classes = supervisor.campfire.Campfire, supervisor.campfire.Room
+        supervisor.campfire.Campfire = FakeCampfire
+        supervisor.campfire.Room = FakeRoom
+
+    def tearDown(self):
+        supervisor.campfire.Campfire, supervisor.campfire.Room = self.classes
+
+    def test_join_failure_is_reported(self):
+        queue = FakeQueue()
+        supervisor._poll_rooms('worker-0', 'foobar', False, 'foo', 'foopass',
+            {'2': None}, queue, None, 3)
+        self.assertEqual([('error', 'worker-0', 'Could not join room 2')],
+            queue)
+
+
+class SupervisorProcessTest(unittest.TestCase):
+    def setUp(self):
+        self.listen = supervisor._listen
+        self.supervisor = Supervisor('foobar', 'foo', 'foopass', workers=1,
+            restart_delay=0, max_restarts=2)
+        self.supervisor.add_room(1)
+
+    def tearDown(self):
+        self.supervisor.stop()
+        supervisor._listen = self.listen
+
+    def collect(self, until):
+        messages = []
+        deadline = time.time() + 10
+        while time.time() < deadline and not until(messages):
+            messages.extend(self.supervisor.messages(0.1))
+        return messages
+
+    def test_crashed_worker_restarts_from_last_cache_id(self):
+        supervisor._listen = crashing_listen
+        self.supervisor.start()
+        messages = self.collect(lambda messages: len(messages) >= 2)
+        self.assertEqual(['1', '2'],
+            [message['id'] for room_id, message in messages])
+        self.assertEqual('2', self.supervisor.cache_ids()['1'])
+        self.assertEqual({}, self.supervisor.failures())
+
+    def test_stop_reads_the_queue(self):
+        supervisor._listen = big_listen
+        self.supervisor.start()
+        time.sleep(0.5)
+        start = time.time()
+        self.supervisor.stop()
+        self.assert_(time.time() - start < 5)
+        messages = self.supervisor.messages(0)
+        self.assertEqual(['1'],
+            [message['id'] for room_id, message in messages])
+
+    def test_failing_worker_is_given_up(self):
+        supervisor._listen = failing_listen
+        self.supervisor.start()
+        self.collect(lambda messages:
+            self.supervisor.failures().get('worker-0', {}).get('given_up'))
+        failure = self.supervisor.failures()['worker-0']
+        self.assertEqual(3, failure['count'])
+        self.assertEqual('Login failed', failure['error'])
+        self.assertEqual({}, self.supervisor._processes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import datetime
+import unittest
+
+from pinder import Campfire, TranscriptStore, TranscriptSync
+
+
+class FakeResponse(object):
+    body = '<table></table>'
+
+
+class TranscriptSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.yesterday = self.today - datetime.timedelta(days=1)
+        self.long_ago = datetime.date(2001, 1, 1)
+        self.listed = {'1': [self.today, self.yesterday, self.long_ago]}
+
+        self.requests = []
+        self.campfire = Campfire('foobar')
+        self.campfire.transcripts = self.transcripts
+        self.campfire._get = self.get
+        self.sync = TranscriptSync(self.campfire)
+
+    def transcripts(self, room_id=None):
+        self.requests.append('transcripts')
+        if room_id:
+            return self.listed.get(str(room_id), [])
+        return self.listed
+
+    def get(self, path=''):
+        self.requests.append(path)
+        return FakeResponse()
+
+    def test_first_sync(self):
+        self.assertEqual({'1': [self.long_ago, self.yesterday, self.today]},
+            self.sync.sync())
+        self.assertEqual(4, len(self.requests))
+        self.assertEqual(self.yesterday, self.sync.store.high_water('1'))
+        self.assertEqual([], self.sync.store.transcript('1', self.today))
+
+    def test_second_sync_fetches_today_only(self):
+        self.sync.sync()
+        self.requests = []
+        self.assertEqual({'1': [self.today]}, self.sync.sync())
+        self.assertEqual(['transcripts', 'room/1/transcript/%s' %
+            self.today.strftime('%Y/%m/%d')], self.requests)
+
+    def test_newest_listed_day_fetched_again(self):
+        # the server day may be behind the local one
+        self.listed = {'1': [self.yesterday, self.long_ago]}
+        self.sync.sync()
+        self.assertEqual(self.long_ago, self.sync.store.high_water('1'))
+        self.assertEqual({'1': [self.yesterday]}, self.sync.sync())
+        self.listed = {'1': [self.today, self.yesterday, self.long_ago]}
+        self.assertEqual({'1': [self.yesterday, self.today]}, self.sync.sync())
+        self.assertEqual(self.yesterday, self.sync.store.high_water('1'))
+
+    def test_sync_room(self):
+        self.sync.store.set_high_water('1', self.long_ago)
+        self.assertEqual({'1': [self.yesterday, self.today]},
+            self.sync.sync(1))
+        self.assertEqual({'2': []}, self.sync.sync(2))
+
+
+class TranscriptStoreTest(unittest.TestCase):
+    def test_mapping(self):
+        mapping = {}
+        store = TranscriptStore(mapping)
+        date = datetime.date(2001, 1, 1)
+        self.assertEqual(None, store.high_water('1'))
+        self.assertEqual(None, store.transcript('1', date))
+        store.save('1', date, [])
+        store.set_high_water('1', date)
+        self.assertEqual(2, len(mapping))
+        self.assertEqual(date, TranscriptStore(mapping).high_water('1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -42,3 +42,56 @@ class MockHttplib2Response(MockResponse):
         
     def __setitem__(self, key, value):
         self.headers[key] = value
+
+def message(id=1, text=None, person='Tom', **data):
+    """Builds message data like Room.messages(), with the given extra keys."""
+    if text is None:
+        text = 'm%s' % id
+    result = dict(id=str(id), user_id='1', person=person, message=text)
+    result.update(data)
+    return result
+
+class FakeRoom(object):
+    """A room reading the messages in 'stream', a list that can be shared
+    with other rooms, failing to read or speak if 'fail' is True."""
+    def __init__(self, id=1, name=None, campfire=None, stream=None,
+            fail=False):
+        self.id = id
+        self.name = name
+        self._campfire = campfire
+        if stream is None:
+            stream = []
+        self.stream = stream
+        self.read = 0
+        self.fail = fail
+        self.last_cache_id = '1'
+        self.by_date = {}
+        self.fetched = []
+        self.pings = 0
+
+    def __eq__(self, other):
+        return self.id == other.id
+
+    def messages(self):
+        if self.fail:
+            raise IOError
+        messages = self.stream[self.read:]
+        self.read = len(self.stream)
+        return messages
+
+    def speak(self, text):
+        if self.fail:
+            return None
+        self.stream.append(message(len(self.stream), text, 'Probe'))
+        return text
+
+    def ping(self, force=False):
+        self.pings += 1
+        return not self.fail
+
+    def transcripts(self):
+        return self.by_date.keys()
+
+    def transcript(self, date):
+        self.fetched.append(date)
+        return self.by_date.get(date, [])